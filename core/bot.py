@@ -13,6 +13,7 @@ from core.handlers import (
     handle_callback,
     error_handler,
 )
+from core.jobs import setup_jobs
 from database.db import init_db
 import logging
 
@@ -38,3 +39,7 @@ def setup_bot(application: Application):
     )
     application.add_error_handler(error_handler)
     logger.info("Bot handlers set up successfully")
+
+    if application.job_queue:
+        logger.info("Scheduling maintenance jobs")
+        setup_jobs(application)
@@ -1,13 +1,21 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database.db import get_user_language, save_user_language
+from database.db import (
+    get_user_language,
+    save_user_language,
+    get_file_id,
+    save_file_id,
+)
 from utils.i18n import get_message
-from services.spotify import process_spotify_link
+from services.spotify import get_track_info_cached, process_spotify_link
+from services.transcoder import PROFILES, get_profile, transcode
 import re
+import asyncio
 import requests
 import os
 import tempfile
 import shutil
+import threading
 from spotdl import Spotdl
 from spotdl.types.options import DownloaderOptions
 import logging
@@ -20,24 +28,32 @@ logger = logging.getLogger(__name__)
 
 # Global spotdl client
 _spotdl_client = None
+_spotdl_lock = threading.Lock()
+
+# Uploads in progress, keyed by file_id index key. Each future resolves to
+# the Telegram file_id, or None if the download failed.
+_inflight_downloads = {}
 
 
 def get_spotdl_client():
     """Get or initialize the global spotdl client."""
     global _spotdl_client
-    if _spotdl_client is None:
-        try:
-            _spotdl_client = Spotdl(
-                client_id=os.getenv("SPOTIFY_CLIENT_ID"),
-                client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
-                downloader_settings=DownloaderOptions(
-                    output="data/downloads/{chat_id}_{message_id}"
-                ),
-            )
-            logger.info("Spotdl client initialized")
-        except Exception as e:
-            logger.error(f"Failed to initialize spotdl client: {str(e)}")
-            raise
+    # Spotdl can only be initialized once per process, and the maintenance
+    # jobs may call this from a worker thread.
+    with _spotdl_lock:
+        if _spotdl_client is None:
+            try:
+                _spotdl_client = Spotdl(
+                    client_id=os.getenv("SPOTIFY_CLIENT_ID"),
+                    client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
+                    downloader_settings=DownloaderOptions(
+                        output="data/downloads/{chat_id}_{message_id}"
+                    ),
+                )
+                logger.info("Spotdl client initialized")
+            except Exception as e:
+                logger.error(f"Failed to initialize spotdl client: {str(e)}")
+                raise
     return _spotdl_client
 
 
@@ -276,14 +292,12 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             keyboard = [
                 [
                     InlineKeyboardButton(
-                        "128 kbps",
-                        callback_data=f"download_song_{track_id}_{chat_id}_{message_id}_128",
-                    ),
-                    InlineKeyboardButton(
-                        "320 kbps",
-                        callback_data=f"download_song_{track_id}_{chat_id}_{message_id}_320",
-                    ),
+                        profile["label"],
+                        callback_data=f"download_song_{track_id}_{profile_id}",
+                    )
+                    for profile_id, profile in list(PROFILES.items())[i : i + 2]
                 ]
+                for i in range(0, len(PROFILES), 2)
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await query.message.reply_text(
@@ -299,25 +313,49 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 get_message(language, "error").format(error="دکمه نامعتبر است")
             )
     elif callback_data.startswith("download_song_"):
+        download_dir = None
+        upload = None
         try:
             parts = callback_data.split("_")
-            if len(parts) != 6 or parts[0] != "download" or parts[1] != "song":
+            # Older buttons also carry chat_id and message_id
+            if (
+                len(parts) not in (4, 6)
+                or parts[0] != "download"
+                or parts[1] != "song"
+            ):
                 raise ValueError("Invalid download_song format")
-            _, track_id, chat_id, message_id, quality = parts
-            if quality not in ["128", "320"]:
-                raise ValueError("Invalid quality value")
+            track_id, profile_id = parts[2], parts[-1]
+            profile = get_profile(profile_id)
             spotify_url = f"https://open.spotify.com/track/{track_id}"
             logger.info(
-                f"User {user_id} requested song download, track_id: {track_id}, quality: {quality}kbps, url: {spotify_url}"
+                f"User {user_id} requested song download, track_id: {track_id}, profile: {profile['id']}, url: {spotify_url}"
             )
             fetching_msg = await query.message.reply_text(
                 get_message(language, "fetching")
             )
-            spotdl = get_spotdl_client()
-            download_dir = f"data/downloads/{chat_id}_{message_id}"
-            os.makedirs(download_dir, exist_ok=True)
+            file_id_key = f"{track_id}:{profile['id']}"
             try:
-                songs = spotdl.search([spotify_url])
+                # Served from the metadata cache when the track was viewed before
+                track_info = await asyncio.to_thread(get_track_info_cached, track_id)
+                caption = get_message(language, "download_song_caption").format(
+                    title=track_info["title"], artist=track_info["artist"]
+                )
+                file_id = get_file_id(file_id_key)
+                if not file_id and file_id_key in _inflight_downloads:
+                    # Same track and profile is already downloading, reuse its upload
+                    file_id = await asyncio.shield(_inflight_downloads[file_id_key])
+                if file_id:
+                    # Already uploaded with this profile, resend without downloading
+                    await query.message.reply_audio(audio=file_id, caption=caption)
+                    await fetching_msg.delete()
+                    logger.info(
+                        f"Sent cached song audio to user {user_id}: {track_info['title']} by {track_info['artist']}, profile: {profile['id']}"
+                    )
+                    return
+                upload = asyncio.get_running_loop().create_future()
+                _inflight_downloads[file_id_key] = upload
+                spotdl = get_spotdl_client()
+                songs = await asyncio.to_thread(spotdl.search, [spotify_url])
                 if not songs:
                     logger.error(
                         f"Song search failed for user {user_id}, track_id: {track_id}: No songs found"
@@ -325,23 +363,28 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     await fetching_msg.edit_text(
                         get_message(language, "download_error")
                     )
-                    shutil.rmtree(download_dir, ignore_errors=True)
                     return
                 song = songs[0]
-                spotdl.downloader_settings.bitrate = f"{quality}k"
-                song_path = spotdl.download(song)
-                if os.path.exists(song_path):
+                os.makedirs("data/downloads", exist_ok=True)
+                download_dir = tempfile.mkdtemp(
+                    prefix=f"{track_id}_{profile['id']}_", dir="data/downloads"
+                )
+                song_path = await transcode(song, profile, download_dir)
+                if song_path and os.path.exists(song_path):
+                    await fetching_msg.edit_text(get_message(language, "sending"))
                     with open(song_path, "rb") as audio_file:
-                        await query.message.reply_audio(
+                        sent_msg = await query.message.reply_audio(
                             audio=audio_file,
-                            caption=get_message(
-                                language, "download_song_caption"
-                            ).format(title=song.name, artist=song.artist),
-                            timeout=1000,
+                            caption=caption,
+                            write_timeout=1000,
+                            read_timeout=1000,
                         )
-                    os.unlink(song_path)
+                    if sent_msg.audio:
+                        save_file_id(file_id_key, sent_msg.audio.file_id)
+                        upload.set_result(sent_msg.audio.file_id)
+                    await fetching_msg.delete()
                     logger.info(
-                        f"Sent song audio to user {user_id}: {song.name} by {song.artist}, quality: {quality}kbps"
+                        f"Sent song audio to user {user_id}: {song.name} by {song.artist}, profile: {profile['id']}"
                     )
                 else:
                     logger.error(
@@ -355,8 +398,6 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     f"Spotdl download error for user {user_id}, track_id: {track_id}: {str(e)}"
                 )
                 await fetching_msg.edit_text(get_message(language, "download_error"))
-            finally:
-                shutil.rmtree(download_dir, ignore_errors=True)
         except ValueError as e:
             logger.error(
                 f"Invalid callback_data format for user {user_id}: {callback_data}, error: {str(e)}"
@@ -366,12 +407,19 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
         except Exception as e:
             logger.error(
-                f"Error downloading song for user {user_id}, track_id: {track_id}, quality: {quality}kbps: {str(e)}"
+                f"Error downloading song for user {user_id}, callback_data: {callback_data}: {str(e)}"
             )
             await query.message.reply_text(
                 get_message(language, "error").format(error=str(e))
             )
-            shutil.rmtree(download_dir, ignore_errors=True)
+        finally:
+            if upload is not None:
+                if not upload.done():
+                    upload.set_result(None)
+                if _inflight_downloads.get(file_id_key) is upload:
+                    del _inflight_downloads[file_id_key]
+            if download_dir:
+                shutil.rmtree(download_dir, ignore_errors=True)
 
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -0,0 +1,245 @@
+import os
+import shutil
+import time
+import asyncio
+from collections import deque
+from telegram import Update
+from telegram.ext import TypeHandler
+from database.db import (
+    compact_db,
+    get_job_state,
+    get_metadata_expiry,
+    get_top_requested,
+    purge_expired_metadata,
+    save_job_state,
+)
+from services.spotify import (
+    METADATA_TTL,
+    prewarm_spotify_token,
+    refresh_recommendations,
+    refresh_track_info,
+)
+from services.transcoder import get_active_jobs
+import logging
+
+# Configure logging
+logging.basicConfig(
+    format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Number of most requested tracks kept warm in the metadata cache
+CACHE_WARM_TOP_N = int(os.getenv("CACHE_WARM_TOP_N", 50))
+# Refresh cached entries this many seconds before they expire
+CACHE_WARM_AHEAD = min(int(os.getenv("CACHE_WARM_AHEAD", 60 * 60)), METADATA_TTL)
+DOWNLOAD_DIR = "data/downloads"
+# Download leftovers changed within this many seconds are never removed
+DOWNLOAD_GRACE = 30 * 60
+# Heavy jobs are skipped while more downloads than this are running
+MAINTENANCE_MAX_ACTIVE_JOBS = int(os.getenv("MAINTENANCE_MAX_ACTIVE_JOBS", 0))
+# Heavy jobs are skipped while the bot receives more updates per minute than this
+MAINTENANCE_MAX_UPDATE_RATE = float(os.getenv("MAINTENANCE_MAX_UPDATE_RATE", 5))
+# Window over which the update rate is measured, in seconds
+ACTIVITY_WINDOW = 5 * 60
+
+# Arrival times of recent updates
+_update_times = deque()
+
+
+def _prune_updates(now: float):
+    while _update_times and _update_times[0] < now - ACTIVITY_WINDOW:
+        _update_times.popleft()
+
+
+async def record_activity(update: Update, context):
+    """Record the arrival of an update for traffic-aware scheduling."""
+    now = time.monotonic()
+    _update_times.append(now)
+    _prune_updates(now)
+
+
+def get_update_rate() -> float:
+    """Get the number of updates per minute over the activity window."""
+    _prune_updates(time.monotonic())
+    return len(_update_times) / (ACTIVITY_WINDOW / 60)
+
+
+def get_skip_reason() -> str | None:
+    """Get why heavy jobs should not run now, or None if the bot is quiet."""
+    active_jobs = get_active_jobs()
+    if active_jobs > MAINTENANCE_MAX_ACTIVE_JOBS:
+        return f"{active_jobs} downloads running"
+    update_rate = get_update_rate()
+    if update_rate > MAINTENANCE_MAX_UPDATE_RATE:
+        return f"{update_rate:.1f} updates per minute"
+    return None
+
+
+# Metadata cache entries kept warm, by key prefix. Each kind is refreshed on
+# its own so a failing endpoint doesn't hold back the others.
+CACHE_REFRESHERS = {
+    "track": refresh_track_info,
+    "recommendations": refresh_recommendations,
+}
+
+
+def warm_metadata_cache() -> dict:
+    """Refresh cached metadata of the most requested tracks before it expires."""
+    deadline = time.time() + CACHE_WARM_AHEAD
+    refreshed = {kind: 0 for kind in CACHE_REFRESHERS}
+    failed = {kind: 0 for kind in CACHE_REFRESHERS}
+    errors = {}
+    for track_id in get_top_requested(CACHE_WARM_TOP_N):
+        for kind, refresh in CACHE_REFRESHERS.items():
+            expires_at = get_metadata_expiry(f"{kind}:{track_id}")
+            if expires_at is not None and expires_at > deadline:
+                continue
+            try:
+                refresh(track_id)
+                refreshed[kind] += 1
+            except Exception as e:
+                failed[kind] += 1
+                errors[kind] = str(e)
+    # Log once per kind rather than per track, since the recommendations
+    # endpoint fails for every track on apps without access to it
+    for kind, error in errors.items():
+        logger.warning(
+            f"Failed to refresh {failed[kind]} {kind} cache entries, last error: {error}"
+        )
+    return {"refreshed": refreshed, "failed": failed}
+
+
+def compact_storage() -> int:
+    """Purge expired metadata, then compact and vacuum the stores."""
+    purged = purge_expired_metadata()
+    compact_db()
+    return purged
+
+
+def get_latest_mtime(path: str) -> float:
+    """Get the newest modification time of a path and everything under it."""
+    latest = os.stat(path).st_mtime
+    for root, dirs, names in os.walk(path):
+        for name in dirs + names:
+            try:
+                latest = max(latest, os.stat(os.path.join(root, name)).st_mtime)
+            except FileNotFoundError:
+                continue
+    return latest
+
+
+def clean_download_dir() -> int:
+    """Remove leftovers of failed downloads from the download directory.
+
+    Finished downloads clean up after themselves, so anything that hasn't
+    changed for DOWNLOAD_GRACE seconds was abandoned. Fresh entries, such as
+    the empty directory of a download that just started, are left alone.
+    """
+    if not os.path.isdir(DOWNLOAD_DIR):
+        return 0
+    cutoff = time.time() - DOWNLOAD_GRACE
+    removed = 0
+    for entry in os.scandir(DOWNLOAD_DIR):
+        try:
+            if get_latest_mtime(entry.path) > cutoff:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+            removed += 1
+        except FileNotFoundError:
+            continue  # Removed by its download in the meantime
+    return removed
+
+
+def prewarm_clients() -> bool:
+    """Refresh the Spotify token ahead of expiry and initialize spotdl."""
+    # Imported here to avoid a circular import with core.handlers
+    from core.handlers import get_spotdl_client
+
+    refreshed = prewarm_spotify_token()
+    get_spotdl_client()
+    return refreshed
+
+
+# Scheduled jobs: interval and first run are in seconds. Heavy jobs are
+# skipped while downloads are running or the bot is busy with updates.
+JOBS = [
+    {
+        "name": "prewarm_clients",
+        "func": prewarm_clients,
+        "interval": 300,
+        "first": 0,
+        "heavy": False,
+    },
+    {
+        "name": "warm_metadata_cache",
+        "func": warm_metadata_cache,
+        "interval": 900,
+        "first": 60,
+        "heavy": True,
+    },
+    {
+        "name": "clean_download_dir",
+        "func": clean_download_dir,
+        "interval": 1800,
+        "first": 120,
+        "heavy": True,
+    },
+    {
+        "name": "compact_storage",
+        "func": compact_storage,
+        "interval": 86400,
+        "first": 600,
+        "heavy": True,
+    },
+]
+
+
+def make_job_callback(name: str, func, heavy: bool):
+    """Wrap a maintenance function in a JobQueue callback that records metrics."""
+
+    async def callback(context):
+        state_key = f"maintenance:{name}"
+        state = get_job_state(state_key) or {"runs": 0, "failures": 0, "skipped": 0}
+        skip_reason = get_skip_reason() if heavy else None
+        if skip_reason:
+            state["skipped"] += 1
+            state["last_skip_reason"] = skip_reason
+            save_job_state(state_key, state)
+            logger.info(f"Skipped job {name}: {skip_reason}")
+            return
+        start = time.perf_counter()
+        try:
+            # Run in a thread so blocking work doesn't stall the bot
+            result = await asyncio.to_thread(func)
+            state["runs"] += 1
+            state["last_result"] = result
+            state["last_error"] = None
+        except Exception as e:
+            state["failures"] += 1
+            state["last_error"] = str(e)
+            logger.error(f"Job {name} failed: {str(e)}")
+        state["last_run"] = time.time()
+        state["last_duration"] = time.perf_counter() - start
+        save_job_state(state_key, state)
+        logger.info(
+            f"Job {name} finished in {state['last_duration']:.2f}s, result: {state.get('last_result')}"
+        )
+
+    return callback
+
+
+def setup_jobs(application):
+    """Track update traffic and schedule the maintenance jobs."""
+    # Group -1 runs before the regular handlers without stopping them
+    application.add_handler(TypeHandler(Update, record_activity), group=-1)
+    for job in JOBS:
+        application.job_queue.run_repeating(
+            make_job_callback(job["name"], job["func"], job["heavy"]),
+            interval=job["interval"],
+            first=job["first"],
+            name=job["name"],
+        )
+        logger.info(f"Scheduled job {job['name']} every {job['interval']}s")
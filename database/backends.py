@@ -0,0 +1,305 @@
+import json
+import os
+import sqlite3
+import threading
+import logging
+from abc import ABC, abstractmethod
+
+# Configure logging
+logging.basicConfig(
+    format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Tables (namespaces) every storage backend must provide
+TABLES = ("users", "metadata", "file_ids", "jobs", "requests")
+
+
+class StorageBackend(ABC):
+    """Base class for key-value storage backends.
+
+    Keys are strings and values are JSON-serializable objects. Each backend
+    stores the records of every table listed in ``TABLES``.
+    """
+
+    name = None
+
+    @abstractmethod
+    def init(self):
+        """Create the underlying storage if it doesn't exist."""
+
+    @abstractmethod
+    def get(self, table: str, key: str):
+        """Return the value stored under key, or None if missing."""
+
+    @abstractmethod
+    def put(self, table: str, key: str, value):
+        """Store value under key, replacing any previous value."""
+
+    def put_many(self, table: str, items):
+        """Store several (key, value) pairs at once."""
+        for key, value in items:
+            self.put(table, key, value)
+
+    @abstractmethod
+    def delete(self, table: str, key: str):
+        """Remove key from table if present."""
+
+    @abstractmethod
+    def items(self, table: str):
+        """Iterate over all (key, value) pairs of a table."""
+
+    @abstractmethod
+    def increment(self, table: str, key: str, amount: int = 1) -> int:
+        """Atomically add amount to an integer value and return the result."""
+
+    def compact(self):
+        """Reclaim unused space in the underlying storage."""
+
+    def close(self):
+        """Release any open handles."""
+
+
+class SQLiteBackend(StorageBackend):
+    """SQLite backend tuned for a long-running bot process.
+
+    A single connection is kept open and shared between threads behind a
+    lock, with WAL journaling and memory-mapped reads enabled.
+    """
+
+    name = "sqlite"
+
+    # Seconds a write on the shared connection waits for a lock held
+    # elsewhere (e.g. by VACUUM) before failing with "database is locked"
+    busy_timeout = 1.0
+
+    def __init__(self, path: str, mmap_size: int = 256 * 1024 * 1024):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-16000")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._conn = conn
+        return self._conn
+
+    def init(self):
+        try:
+            with self._lock:
+                conn = self._connect()
+                # The users table keeps its original schema so existing
+                # databases stay readable.
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS users (
+                        user_id INTEGER PRIMARY KEY,
+                        language TEXT
+                    )
+                """
+                )
+                for table in TABLES:
+                    if table == "users":
+                        continue
+                    conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS {table} "
+                        "(key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+                    )
+                conn.commit()
+        except sqlite3.OperationalError as e:
+            logger.error(f"Error initializing SQLite backend: {str(e)}")
+            raise
+
+    @staticmethod
+    def _check_table(table: str):
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+
+    def get(self, table: str, key: str):
+        self._check_table(table)
+        with self._lock:
+            conn = self._connect()
+            if table == "users":
+                row = conn.execute(
+                    "SELECT language FROM users WHERE user_id = ?", (int(key),)
+                ).fetchone()
+                return row[0] if row else None
+            row = conn.execute(
+                f"SELECT value FROM {table} WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, table: str, key: str, value):
+        self.put_many(table, [(key, value)])
+
+    def put_many(self, table: str, items):
+        self._check_table(table)
+        if table == "users":
+            query = "INSERT OR REPLACE INTO users (user_id, language) VALUES (?, ?)"
+            rows = [(int(key), value) for key, value in items]
+        else:
+            query = f"INSERT OR REPLACE INTO {table} (key, value) VALUES (?, ?)"
+            rows = [(key, json.dumps(value)) for key, value in items]
+        with self._lock:
+            conn = self._connect()
+            # Commits, or rolls back if the write fails (e.g. while busy)
+            with conn:
+                conn.executemany(query, rows)
+
+    def delete(self, table: str, key: str):
+        self._check_table(table)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if table == "users":
+                    conn.execute("DELETE FROM users WHERE user_id = ?", (int(key),))
+                else:
+                    conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+
+    def increment(self, table: str, key: str, amount: int = 1) -> int:
+        self._check_table(table)
+        if table == "users":
+            raise ValueError("Cannot increment values of the users table")
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute(
+                    f"INSERT INTO {table} (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value "
+                    "RETURNING value",
+                    (key, amount),
+                ).fetchone()
+        return int(row[0])
+
+    def items(self, table: str):
+        self._check_table(table)
+        with self._lock:
+            conn = self._connect()
+            if table == "users":
+                rows = conn.execute("SELECT user_id, language FROM users").fetchall()
+                return [(str(user_id), language) for user_id, language in rows]
+            rows = conn.execute(f"SELECT key, value FROM {table}").fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def compact(self):
+        # Use a separate connection so reads on the shared one aren't queued
+        # behind the lock while VACUUM runs. Writes still wait for VACUUM, up
+        # to busy_timeout.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA optimize")
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class LMDBBackend(StorageBackend):
+    """Embedded memory-mapped key-value backend built on LMDB.
+
+    Reads are served straight from the memory map without copying through a
+    SQL layer, which suits the read-heavy lookups (user language, file_id
+    index, metadata cache). Requires the optional ``lmdb`` package.
+    """
+
+    name = "lmdb"
+
+    def __init__(self, path: str, map_size: int = 512 * 1024 * 1024):
+        self.path = path
+        self.map_size = map_size
+        self._env = None
+        self._dbs = {}
+
+    def init(self):
+        if self._env is not None:
+            return
+        try:
+            import lmdb
+        except ImportError as e:
+            logger.error("The lmdb package is required for the lmdb backend")
+            raise RuntimeError(
+                "lmdb backend selected but the 'lmdb' package is not installed"
+            ) from e
+        os.makedirs(self.path, exist_ok=True)
+        self._env = lmdb.open(self.path, map_size=self.map_size, max_dbs=len(TABLES))
+        self._dbs = {
+            table: self._env.open_db(table.encode()) for table in TABLES
+        }
+
+    def _db(self, table: str):
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        self.init()
+        return self._dbs[table]
+
+    def get(self, table: str, key: str):
+        db = self._db(table)
+        with self._env.begin(db=db) as txn:
+            raw = txn.get(str(key).encode())
+        return json.loads(raw) if raw is not None else None
+
+    def put(self, table: str, key: str, value):
+        self.put_many(table, [(key, value)])
+
+    def put_many(self, table: str, items):
+        db = self._db(table)
+        with self._env.begin(db=db, write=True) as txn:
+            for key, value in items:
+                txn.put(str(key).encode(), json.dumps(value).encode())
+
+    def delete(self, table: str, key: str):
+        db = self._db(table)
+        with self._env.begin(db=db, write=True) as txn:
+            txn.delete(str(key).encode())
+
+    def increment(self, table: str, key: str, amount: int = 1) -> int:
+        db = self._db(table)
+        # A single write transaction, LMDB allows only one writer at a time
+        with self._env.begin(db=db, write=True) as txn:
+            raw = txn.get(str(key).encode())
+            value = (json.loads(raw) if raw is not None else 0) + amount
+            txn.put(str(key).encode(), json.dumps(value).encode())
+        return value
+
+    def items(self, table: str):
+        db = self._db(table)
+        with self._env.begin(db=db) as txn:
+            return [
+                (key.decode(), json.loads(value))
+                for key, value in txn.cursor()
+            ]
+
+    def close(self):
+        if self._env is not None:
+            self._env.close()
+            self._env = None
+            self._dbs = {}
+
+
+BACKENDS = {
+    SQLiteBackend.name: SQLiteBackend,
+    LMDBBackend.name: LMDBBackend,
+}
+
+
+def create_backend(name: str, path: str) -> StorageBackend:
+    """Create a storage backend by name."""
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {name}")
+    return backend_cls(path)
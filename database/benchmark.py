@@ -0,0 +1,93 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from database.backends import BACKENDS, TABLES, create_backend
+
+# Sample values resembling what each table stores in production
+SAMPLE_VALUES = {
+    "users": "en",
+    "metadata": {
+        "data": {
+            "track_id": "4uLU6hMCjMI75M1A2tKUQC",
+            "title": "Never Gonna Give You Up",
+            "artist": "Rick Astley",
+            "genre": "dance pop",
+            "duration": "3:33",
+            "release_date": "1987-11-12",
+        },
+        "expires_at": 0,
+    },
+    "file_ids": "CQACAgQAAxkBAAIBZ2Zx7_sample_file_id",
+    "jobs": {"status": "done", "updated_at": 0},
+    "requests": 42,
+}
+
+
+def bench_backend(backend, records: int, reads: int) -> dict:
+    """Time bulk writes, single writes and random reads for every table."""
+    results = {}
+    for table in TABLES:
+        value = SAMPLE_VALUES[table]
+        keys = [str(i) for i in range(records)]
+
+        start = time.perf_counter()
+        backend.put_many(table, [(key, value) for key in keys])
+        bulk_write = time.perf_counter() - start
+
+        single_keys = [str(records + i) for i in range(min(reads, records))]
+        start = time.perf_counter()
+        for key in single_keys:
+            backend.put(table, key, value)
+        single_write = time.perf_counter() - start
+
+        lookups = [random.choice(keys) for _ in range(reads)]
+        start = time.perf_counter()
+        for key in lookups:
+            backend.get(table, key)
+        read = time.perf_counter() - start
+
+        results[table] = {
+            "bulk_write_per_sec": records / bulk_write if bulk_write else 0,
+            "write_per_sec": len(single_keys) / single_write if single_write else 0,
+            "read_per_sec": reads / read if read else 0,
+        }
+    return results
+
+
+def main():
+    """Compare storage backends on each workload."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark SpotyMateBot storage backends."
+    )
+    parser.add_argument(
+        "--backends", nargs="+", choices=sorted(BACKENDS), default=sorted(BACKENDS)
+    )
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--reads", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in args.backends:
+            backend = create_backend(name, os.path.join(tmp_dir, f"bench_{name}"))
+            try:
+                backend.init()
+            except RuntimeError as e:
+                print(f"{name}: skipped ({e})")
+                continue
+            try:
+                results = bench_backend(backend, args.records, args.reads)
+            finally:
+                backend.close()
+            for table, stats in results.items():
+                print(
+                    f"{name:<8} {table:<10} "
+                    f"bulk write {stats['bulk_write_per_sec']:>12,.0f}/s  "
+                    f"write {stats['write_per_sec']:>10,.0f}/s  "
+                    f"read {stats['read_per_sec']:>12,.0f}/s"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,72 @@
 import sqlite3
 import os
+import time
+from database.backends import TABLES, create_backend
 
+# Default backend used for every workload unless overridden per table with
+# STORAGE_BACKEND_<TABLE> (e.g. STORAGE_BACKEND_FILE_IDS=lmdb).
+DEFAULT_BACKEND = "sqlite"
 
-def get_db_path():
-    """Get the absolute path to the database file."""
+# Backend instances, shared between workloads that use the same backend
+_backends = {}
+
+
+def get_data_dir():
+    """Get the absolute path to the data directory."""
     base_dir = os.path.dirname(os.path.abspath(__file__))
     data_dir = os.path.join(base_dir, "../data")
     os.makedirs(data_dir, exist_ok=True)  # Create data directory if it doesn't exist
-    return os.path.join(data_dir, "users.db")
+    return data_dir
+
+
+def get_db_path():
+    """Get the absolute path to the database file."""
+    return os.path.join(get_data_dir(), "users.db")
+
+
+def get_kv_path():
+    """Get the absolute path to the embedded key-value store directory."""
+    return os.path.join(get_data_dir(), "kv.lmdb")
+
+
+def get_backend_path(name: str) -> str:
+    """Get the storage path used by the named backend."""
+    return get_kv_path() if name == "lmdb" else get_db_path()
+
+
+def get_backend_name(table: str) -> str:
+    """Get the backend name configured for a table."""
+    default = os.getenv("STORAGE_BACKEND", DEFAULT_BACKEND)
+    return os.getenv(f"STORAGE_BACKEND_{table.upper()}", default)
+
+
+def get_backend(table: str):
+    """Get or initialize the storage backend serving a table."""
+    name = get_backend_name(table)
+    if name not in _backends:
+        backend = create_backend(name, get_backend_path(name))
+        backend.init()
+        _backends[name] = backend
+    return _backends[name]
+
+
+def close_backends():
+    """Close all open storage backends."""
+    for backend in _backends.values():
+        backend.close()
+    _backends.clear()
+
+
+def is_busy_error(error: sqlite3.OperationalError) -> bool:
+    """Check whether an SQLite error means the database is locked by another writer."""
+    return "locked" in str(error) or "busy" in str(error)
 
 
 def init_db():
-    """Initialize the SQLite database."""
+    """Initialize the storage backends for all tables."""
     try:
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                language TEXT
-            )
-        """
-        )
-        conn.commit()
-        conn.close()
+        for table in TABLES:
+            get_backend(table)
         print("Database initialized successfully.")
     except sqlite3.OperationalError as e:
         print(f"Error initializing database: {e}")
@@ -34,14 +76,7 @@ def init_db():
 def save_user_language(user_id: int, language: str):
     """Save user's language preference."""
     try:
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT OR REPLACE INTO users (user_id, language) VALUES (?, ?)",
-            (user_id, language),
-        )
-        conn.commit()
-        conn.close()
+        get_backend("users").put("users", str(user_id), language)
     except sqlite3.OperationalError as e:
         print(f"Error saving user language: {e}")
         raise
@@ -50,12 +85,96 @@ def save_user_language(user_id: int, language: str):
 def get_user_language(user_id: int) -> str:
     """Retrieve user's language preference."""
     try:
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT language FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else None
+        return get_backend("users").get("users", str(user_id))
     except sqlite3.OperationalError as e:
         print(f"Error retrieving user language: {e}")
         raise
+
+
+def save_metadata(key: str, data: dict, ttl: int):
+    """Cache metadata under key for ttl seconds."""
+    get_backend("metadata").put(
+        "metadata", key, {"data": data, "expires_at": time.time() + ttl}
+    )
+
+
+def get_metadata(key: str) -> dict | None:
+    """Retrieve cached metadata, or None if missing or expired."""
+    entry = get_backend("metadata").get("metadata", key)
+    if not entry or entry["expires_at"] < time.time():
+        return None
+    return entry["data"]
+
+
+def get_metadata_expiry(key: str) -> float | None:
+    """Get the expiry timestamp of cached metadata, or None if missing."""
+    entry = get_backend("metadata").get("metadata", key)
+    return entry["expires_at"] if entry else None
+
+
+def purge_expired_metadata() -> int:
+    """Delete expired metadata entries and return how many were removed."""
+    backend = get_backend("metadata")
+    now = time.time()
+    expired = [
+        key for key, entry in backend.items("metadata") if entry["expires_at"] < now
+    ]
+    for key in expired:
+        backend.delete("metadata", key)
+    return len(expired)
+
+
+def save_file_id(key: str, file_id: str):
+    """Save a Telegram file_id for an uploaded file."""
+    try:
+        get_backend("file_ids").put("file_ids", key, file_id)
+    except sqlite3.OperationalError as e:
+        if not is_busy_error(e):
+            raise
+        # Only a cache, the file is uploaded again next time
+        print(f"Skipped saving file_id while database is busy: {e}")
+
+
+def get_file_id(key: str) -> str | None:
+    """Retrieve a previously saved Telegram file_id."""
+    return get_backend("file_ids").get("file_ids", key)
+
+
+def save_job_state(job_id: str, state: dict):
+    """Save the state of a background job."""
+    try:
+        get_backend("jobs").put("jobs", job_id, state)
+    except sqlite3.OperationalError as e:
+        if not is_busy_error(e):
+            raise
+        print(f"Skipped saving job state while database is busy: {e}")
+
+
+def get_job_state(job_id: str) -> dict | None:
+    """Retrieve the state of a background job."""
+    return get_backend("jobs").get("jobs", job_id)
+
+
+def increment_request_count(track_id: str):
+    """Count a request for a track."""
+    try:
+        get_backend("requests").increment("requests", track_id)
+    except sqlite3.OperationalError as e:
+        if not is_busy_error(e):
+            raise
+        print(f"Skipped counting request while database is busy: {e}")
+
+
+def get_top_requested(limit: int) -> list:
+    """Get the IDs of the most requested tracks."""
+    counts = get_backend("requests").items("requests")
+    counts = sorted(counts, key=lambda item: item[1], reverse=True)
+    return [track_id for track_id, _ in counts[:limit]]
+
+
+def compact_db():
+    """Compact and vacuum every storage backend in use."""
+    for table in TABLES:
+        get_backend(table)
+    for backend in _backends.values():
+        backend.compact()
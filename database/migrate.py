@@ -0,0 +1,48 @@
+import argparse
+from database.backends import TABLES, create_backend
+from database.db import get_backend_path
+
+
+def migrate(source, target, tables=TABLES) -> dict:
+    """Copy all records of the given tables from source to target backend."""
+    counts = {}
+    for table in tables:
+        items = list(source.items(table))
+        target.put_many(table, items)
+        counts[table] = len(items)
+    return counts
+
+
+def main():
+    """Migrate stored data between storage backends."""
+    parser = argparse.ArgumentParser(
+        description="Migrate SpotyMateBot data between storage backends."
+    )
+    parser.add_argument("source", help="Source backend name (e.g. sqlite)")
+    parser.add_argument("target", help="Target backend name (e.g. lmdb)")
+    parser.add_argument(
+        "--tables",
+        nargs="+",
+        choices=TABLES,
+        default=list(TABLES),
+        help="Tables to migrate (default: all)",
+    )
+    args = parser.parse_args()
+    if args.source == args.target:
+        parser.error("Source and target backends must differ")
+
+    source = create_backend(args.source, get_backend_path(args.source))
+    target = create_backend(args.target, get_backend_path(args.target))
+    try:
+        source.init()
+        target.init()
+        counts = migrate(source, target, args.tables)
+    finally:
+        source.close()
+        target.close()
+    for table, count in counts.items():
+        print(f"{table}: migrated {count} records")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import os
+import re
+import time
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 import logging
+from database.db import get_metadata, save_metadata, increment_request_count
 from utils.i18n import get_message
 
 # Configure logging
@@ -13,6 +16,9 @@ logger = logging.getLogger(__name__)
 # Global Spotify client
 _spotify_client = None
 
+# How long track info and recommendations stay cached, in seconds
+METADATA_TTL = int(os.getenv("METADATA_TTL", 24 * 60 * 60))
+
 
 def get_spotify_client():
     """Get or initialize the global Spotify client."""
@@ -32,6 +38,99 @@ def get_spotify_client():
     return _spotify_client
 
 
+def prewarm_spotify_token(ahead: int = 600) -> bool:
+    """Request a new access token if the cached one expires within ahead seconds.
+
+    Returns True if a new token was requested.
+    """
+    auth_manager = get_spotify_client().auth_manager
+    token_info = auth_manager.cache_handler.get_cached_token()
+    if token_info and token_info["expires_at"] - time.time() > ahead:
+        return False
+    auth_manager.get_access_token(as_dict=False, check_cache=False)
+    logger.info("Spotify access token refreshed")
+    return True
+
+
+def get_track_id(link: str) -> str:
+    """Extract the track ID from a Spotify track URL or URI."""
+    match = re.search(r"track[/:]([a-zA-Z0-9]+)", link)
+    return match.group(1) if match else link.split(":")[-1]
+
+
+def fetch_track_info(track_id: str) -> dict:
+    """Fetch track information from the Spotify API."""
+    sp = get_spotify_client()
+    track = sp.track(track_id)
+    album = sp.album(track["album"]["id"])
+    # Convert duration from milliseconds to MM:SS
+    duration_ms = track["duration_ms"]
+    minutes = duration_ms // 60000
+    seconds = (duration_ms % 60000) // 1000
+    duration = f"{minutes}:{seconds:02d}"
+    # Get genre (from album or artist, if available)
+    genres = album.get("genres", []) or sp.artist(track["artists"][0]["id"]).get(
+        "genres", []
+    )
+    genre = genres[0] if genres else None
+    return {
+        "track_id": track["id"],
+        "title": track["name"],
+        "artist": track["artists"][0]["name"],
+        "cover_url": (
+            track["album"]["images"][0]["url"] if track["album"]["images"] else None
+        ),
+        "preview_url": track.get("preview_url", None),
+        "genre": genre,
+        "duration": duration,
+        "release_date": album.get("release_date", "Unknown"),
+    }
+
+
+def fetch_recommendations(track_id: str) -> list:
+    """Fetch recommendations for a track from the Spotify API."""
+    sp = get_spotify_client()
+    recommendations = sp.recommendations(seed_tracks=[track_id], limit=3, market="US")
+    return [
+        {
+            "title": track["name"],
+            "artist": track["artists"][0]["name"],
+            "track_id": track["id"],
+        }
+        for track in recommendations["tracks"]
+    ]
+
+
+def get_track_info_cached(track_id: str) -> dict:
+    """Get track information from the metadata cache or the Spotify API."""
+    track_info = get_metadata(f"track:{track_id}")
+    if track_info is None:
+        track_info = fetch_track_info(track_id)
+        save_metadata(f"track:{track_id}", track_info, METADATA_TTL)
+    return track_info
+
+
+def get_recommendations_cached(track_id: str) -> list:
+    """Get recommendations from the metadata cache or the Spotify API."""
+    recommendations = get_metadata(f"recommendations:{track_id}")
+    if recommendations is None:
+        recommendations = fetch_recommendations(track_id)
+        save_metadata(f"recommendations:{track_id}", recommendations, METADATA_TTL)
+    return recommendations
+
+
+def refresh_track_info(track_id: str):
+    """Refetch and re-cache track information."""
+    save_metadata(f"track:{track_id}", fetch_track_info(track_id), METADATA_TTL)
+
+
+def refresh_recommendations(track_id: str):
+    """Refetch and re-cache recommendations for a track."""
+    save_metadata(
+        f"recommendations:{track_id}", fetch_recommendations(track_id), METADATA_TTL
+    )
+
+
 def process_spotify_link(
     link: str, language: str, get_recommendations: bool = False
 ) -> dict | str | list:
@@ -40,27 +139,17 @@ def process_spotify_link(
         f"Processing Spotify link: {link}, recommendations: {get_recommendations}"
     )
     try:
-        sp = get_spotify_client()
         if get_recommendations:
             track_id = link.split(":")[-1]
             try:
-                recommendations = sp.recommendations(
-                    seed_tracks=[track_id], limit=3, market="US"
-                )
-                if not recommendations["tracks"]:
+                recommendations = get_recommendations_cached(track_id)
+                if not recommendations:
                     logger.warning(f"No recommendations found for track_id: {track_id}")
                     return get_message(language, "similar_songs_placeholder")
                 logger.info(
-                    f"Fetched {len(recommendations['tracks'])} recommendations for track_id: {track_id}"
+                    f"Fetched {len(recommendations)} recommendations for track_id: {track_id}"
                 )
-                return [
-                    {
-                        "title": track["name"],
-                        "artist": track["artists"][0]["name"],
-                        "track_id": track["id"],
-                    }
-                    for track in recommendations["tracks"]
-                ]
+                return recommendations
             except spotipy.exceptions.SpotifyException as e:
                 logger.error(
                     f"Spotify API error for recommendations, track_id: {track_id}: {str(e)}"
@@ -69,32 +158,11 @@ def process_spotify_link(
                     error="Failed to fetch similar songs"
                 )
         if "track" in link:
-            track = sp.track(link)
-            album = sp.album(track["album"]["id"])
-            # Convert duration from milliseconds to MM:SS
-            duration_ms = track["duration_ms"]
-            minutes = duration_ms // 60000
-            seconds = (duration_ms % 60000) // 1000
-            duration = f"{minutes}:{seconds:02d}"
-            # Get genre (from album or artist, if available)
-            genres = album.get("genres", []) or sp.artist(
-                track["artists"][0]["id"]
-            ).get("genres", [])
-            genre = genres[0] if genres else None
-            track_info = {
-                "track_id": track["id"],
-                "title": track["name"],
-                "artist": track["artists"][0]["name"],
-                "cover_url": (
-                    track["album"]["images"][0]["url"]
-                    if track["album"]["images"]
-                    else None
-                ),
-                "preview_url": track.get("preview_url", None),
-                "genre": genre,
-                "duration": duration,
-                "release_date": album.get("release_date", "Unknown"),
-            }
+            track_id = get_track_id(link)
+            # Only track views are counted; downloads follow a view and
+            # would count the same request twice.
+            increment_request_count(track_id)
+            track_info = get_track_info_cached(track_id)
             logger.info(
                 f"Processed track info: {track_info['title']} by {track_info['artist']}"
             )
@@ -0,0 +1,122 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+# Configure logging
+logging.basicConfig(
+    format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Transcoding profiles offered to users. A bitrate of "disable" keeps the
+# source stream as-is when its container already matches the format, so the
+# file is delivered without re-encoding.
+PROFILES = {
+    "mp3-128": {"label": "MP3 128 kbps", "format": "mp3", "bitrate": "128k"},
+    "mp3-320": {"label": "MP3 320 kbps", "format": "mp3", "bitrate": "320k"},
+    "m4a": {"label": "M4A (original)", "format": "m4a", "bitrate": "disable"},
+    "opus": {"label": "Opus (original)", "format": "opus", "bitrate": "disable"},
+}
+
+# Quality values used by older download buttons
+LEGACY_PROFILES = {"128": "mp3-128", "320": "mp3-320"}
+
+# Global transcoding executor
+_executor = None
+
+# Number of download jobs currently running or waiting for their track
+_active_jobs = 0
+
+# Per-track locks and how many jobs hold or wait for each. spotdl downloads
+# every track to a shared temp file named after its YouTube ID, so jobs for
+# the same track must not run at the same time.
+_track_locks = {}
+
+
+def get_profile(profile_id: str) -> dict:
+    """Get a transcoding profile by id, accepting legacy quality values."""
+    profile_id = LEGACY_PROFILES.get(profile_id, profile_id)
+    if profile_id not in PROFILES:
+        raise ValueError(f"Unknown transcoding profile: {profile_id}")
+    return {"id": profile_id, **PROFILES[profile_id]}
+
+
+def get_transcode_workers() -> int:
+    """Get the number of concurrent transcoding jobs, based on available cores."""
+    workers = os.getenv("TRANSCODE_WORKERS")
+    if workers:
+        return max(1, int(workers))
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get or initialize the global transcoding executor."""
+    global _executor
+    if _executor is None:
+        workers = get_transcode_workers()
+        _executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="transcoder"
+        )
+        logger.info(f"Transcoding executor initialized with {workers} workers")
+    return _executor
+
+
+def get_active_jobs() -> int:
+    """Get the number of download jobs currently running."""
+    return _active_jobs
+
+
+def download_song(song, profile: dict, download_dir: str) -> str | None:
+    """Download and transcode a song with its own downloader settings.
+
+    Every job gets a dedicated downloader so concurrent downloads never share
+    format or bitrate settings.
+    """
+    from spotdl.download.downloader import Downloader
+
+    downloader = Downloader(
+        {
+            "output": os.path.join(download_dir, "{artists} - {title}.{output-ext}"),
+            "format": profile["format"],
+            "bitrate": profile["bitrate"],
+            "threads": 1,
+            "simple_tui": True,
+        }
+    )
+    try:
+        _, song_path = downloader.download_song(song)
+    finally:
+        downloader.loop.close()
+    return str(song_path) if song_path else None
+
+
+async def transcode(song, profile: dict, download_dir: str) -> str | None:
+    """Run a download job on the transcoding executor.
+
+    Jobs for the same track run one after another.
+    """
+    global _active_jobs
+    loop = asyncio.get_running_loop()
+    track_id = song.song_id
+    lock, waiters = _track_locks.get(track_id, (asyncio.Lock(), 0))
+    _track_locks[track_id] = (lock, waiters + 1)
+    _active_jobs += 1
+    try:
+        async with lock:
+            logger.info(
+                f"Transcoding {song.name} by {song.artist} with profile {profile['id']}"
+            )
+            return await loop.run_in_executor(
+                get_executor(), download_song, song, profile, download_dir
+            )
+    finally:
+        _active_jobs -= 1
+        lock, waiters = _track_locks[track_id]
+        if waiters == 1:
+            del _track_locks[track_id]
+        else:
+            _track_locks[track_id] = (lock, waiters - 1)
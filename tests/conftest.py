@@ -0,0 +1,13 @@
+import pytest
+from database import db
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point the storage backends at a temporary data directory."""
+    monkeypatch.setattr(db, "get_data_dir", lambda: str(tmp_path))
+    monkeypatch.delenv("STORAGE_BACKEND", raising=False)
+    db.close_backends()
+    db.init_db()
+    yield tmp_path
+    db.close_backends()
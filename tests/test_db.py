@@ -0,0 +1,171 @@
+import sqlite3
+import threading
+import pytest
+from database import db
+from database.backends import TABLES, SQLiteBackend, StorageBackend, create_backend
+from database.benchmark import SAMPLE_VALUES
+from database.migrate import migrate
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "users.db"))
+    backend.init()
+    yield backend
+    backend.close()
+
+
+def test_storage_backend_is_abstract():
+    class IncompleteBackend(StorageBackend):
+        def init(self):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteBackend()
+
+
+def test_sqlite_backend_get_put_delete_items(sqlite_backend):
+    sqlite_backend.put("file_ids", "track:mp3-128", "file-1")
+    sqlite_backend.put("jobs", "job-1", {"status": "done"})
+
+    assert sqlite_backend.get("file_ids", "track:mp3-128") == "file-1"
+    assert sqlite_backend.get("jobs", "job-1") == {"status": "done"}
+    assert sqlite_backend.get("jobs", "missing") is None
+    assert sqlite_backend.items("jobs") == [("job-1", {"status": "done"})]
+
+    sqlite_backend.delete("jobs", "job-1")
+    assert sqlite_backend.get("jobs", "job-1") is None
+    assert sqlite_backend.items("jobs") == []
+
+
+def test_sqlite_backend_unknown_table(sqlite_backend):
+    with pytest.raises(ValueError):
+        sqlite_backend.get("unknown", "key")
+
+
+def test_sqlite_backend_reads_legacy_users_table(tmp_path):
+    path = str(tmp_path / "users.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, language TEXT)")
+    conn.execute("INSERT INTO users (user_id, language) VALUES (42, 'fa')")
+    conn.commit()
+    conn.close()
+
+    backend = SQLiteBackend(path)
+    backend.init()
+    try:
+        assert backend.get("users", "42") == "fa"
+        backend.put("users", "7", "en")
+        assert sorted(backend.items("users")) == [("42", "fa"), ("7", "en")]
+        backend.delete("users", "42")
+        assert backend.get("users", "42") is None
+    finally:
+        backend.close()
+
+
+def test_migrate_round_trip(sqlite_backend, tmp_path):
+    pytest.importorskip("lmdb")
+    sqlite_backend.put("users", "42", "fa")
+    sqlite_backend.put(
+        "metadata", "track:1", {"data": {"title": "x"}, "expires_at": 1}
+    )
+
+    lmdb_backend = create_backend("lmdb", str(tmp_path / "kv.lmdb"))
+    lmdb_backend.init()
+    restored = SQLiteBackend(str(tmp_path / "restored.db"))
+    restored.init()
+    try:
+        counts = migrate(sqlite_backend, lmdb_backend)
+        assert counts["users"] == 1
+        assert counts["metadata"] == 1
+        migrate(lmdb_backend, restored)
+        assert restored.get("users", "42") == "fa"
+        assert restored.get("metadata", "track:1") == {
+            "data": {"title": "x"},
+            "expires_at": 1,
+        }
+    finally:
+        lmdb_backend.close()
+        restored.close()
+
+
+def test_user_language(data_dir):
+    db.save_user_language(42, "fa")
+    assert db.get_user_language(42) == "fa"
+    assert db.get_user_language(7) is None
+
+
+def test_get_metadata_expiry(data_dir, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(db.time, "time", lambda: now)
+    db.save_metadata("track:1", {"title": "x"}, ttl=60)
+    assert db.get_metadata("track:1") == {"title": "x"}
+    assert db.get_metadata_expiry("track:1") == now + 60
+
+    now += 61
+    assert db.get_metadata("track:1") is None
+    assert db.purge_expired_metadata() == 1
+    assert db.get_metadata_expiry("track:1") is None
+
+
+def test_benchmark_has_sample_value_for_every_table():
+    assert set(SAMPLE_VALUES) == set(TABLES)
+
+
+def test_sqlite_backend_increment(sqlite_backend):
+    assert sqlite_backend.increment("requests", "track1") == 1
+    assert sqlite_backend.increment("requests", "track1", 2) == 3
+    assert sqlite_backend.get("requests", "track1") == 3
+    with pytest.raises(ValueError):
+        sqlite_backend.increment("users", "42")
+
+
+def test_lmdb_backend_increment(tmp_path):
+    pytest.importorskip("lmdb")
+    backend = create_backend("lmdb", str(tmp_path / "kv.lmdb"))
+    backend.init()
+    try:
+        assert backend.increment("requests", "track1") == 1
+        assert backend.increment("requests", "track1", 2) == 3
+        assert backend.get("requests", "track1") == 3
+    finally:
+        backend.close()
+
+
+def test_increment_request_count_is_atomic(data_dir):
+    def count():
+        for _ in range(200):
+            db.increment_request_count("track1")
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert db.get_backend("requests").get("requests", "track1") == 800
+    db.increment_request_count("track2")
+    assert db.get_top_requested(1) == ["track1"]
+
+
+def test_writes_while_database_is_busy(data_dir, monkeypatch):
+    monkeypatch.setattr(SQLiteBackend, "busy_timeout", 0.05)
+    db.close_backends()
+    db.save_user_language(42, "en")
+    blocker = sqlite3.connect(db.get_db_path())
+    # Holds the write lock like VACUUM does
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        db.save_file_id("track1:opus", "file-1")
+        db.save_job_state("maintenance:compact_storage", {"runs": 1})
+        db.increment_request_count("track1")
+        with pytest.raises(sqlite3.OperationalError):
+            db.save_user_language(42, "fa")
+        # WAL readers are not blocked
+        assert db.get_user_language(42) == "en"
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+    assert db.get_file_id("track1:opus") is None
+    db.save_file_id("track1:opus", "file-1")
+    assert db.get_file_id("track1:opus") == "file-1"
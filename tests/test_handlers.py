@@ -0,0 +1,213 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import pytest
+from services import transcoder
+from services.transcoder import PROFILES, get_profile
+
+
+def make_song(song_id="track1"):
+    return SimpleNamespace(song_id=song_id, name="Song", artist="Artist")
+
+
+def test_get_profile_maps_legacy_quality():
+    profile = get_profile("128")
+    assert profile["id"] == "mp3-128"
+    assert profile["format"] == "mp3"
+    assert profile["bitrate"] == "128k"
+    assert get_profile("320")["id"] == "mp3-320"
+
+
+def test_get_profile_pass_through():
+    for profile_id in ("m4a", "opus"):
+        assert get_profile(profile_id)["bitrate"] == "disable"
+
+
+def test_get_profile_unknown_raises():
+    with pytest.raises(ValueError):
+        get_profile("flac-9000")
+
+
+def test_profile_ids_fit_callback_data():
+    # Callback data is split on "_" and limited to 64 bytes by Telegram
+    for profile_id in PROFILES:
+        assert "_" not in profile_id
+        assert len(f"download_song_{'x' * 22}_{profile_id}") <= 64
+
+
+def test_transcode_serializes_jobs_for_same_track(monkeypatch):
+    running = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def fake_download_song(song, profile, download_dir):
+        with lock:
+            running.append(profile["id"])
+            if len(running) > 1:
+                overlaps.append(list(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(profile["id"])
+        return f"{download_dir}/song.{profile['format']}"
+
+    monkeypatch.setattr(transcoder, "download_song", fake_download_song)
+
+    async def run():
+        return await asyncio.gather(
+            transcoder.transcode(make_song(), get_profile("mp3-128"), "a"),
+            transcoder.transcode(make_song(), get_profile("mp3-320"), "b"),
+        )
+
+    assert asyncio.run(run()) == ["a/song.mp3", "b/song.mp3"]
+    assert overlaps == []
+    assert transcoder._track_locks == {}
+    assert transcoder.get_active_jobs() == 0
+
+
+@pytest.fixture
+def handlers(monkeypatch, tmp_path):
+    module = pytest.importorskip("core.handlers")
+    monkeypatch.chdir(tmp_path)
+    file_ids = {}
+    calls = SimpleNamespace(search=0, transcode=0)
+
+    def search(urls):
+        calls.search += 1
+        return [make_song(urls[0].rsplit("/", 1)[-1])]
+
+    async def fake_transcode(song, profile, download_dir):
+        calls.transcode += 1
+        await asyncio.sleep(0.05)
+        path = f"{download_dir}/song.{profile['format']}"
+        with open(path, "wb") as f:
+            f.write(b"audio")
+        return path
+
+    monkeypatch.setattr(module, "get_user_language", lambda user_id: "en")
+    monkeypatch.setattr(
+        module,
+        "get_track_info_cached",
+        lambda track_id: {"title": "Song", "artist": "Artist"},
+    )
+    monkeypatch.setattr(module, "get_file_id", file_ids.get)
+    monkeypatch.setattr(module, "save_file_id", file_ids.__setitem__)
+    monkeypatch.setattr(
+        module, "get_spotdl_client", lambda: SimpleNamespace(search=search)
+    )
+    monkeypatch.setattr(module, "transcode", fake_transcode)
+    return SimpleNamespace(module=module, file_ids=file_ids, calls=calls)
+
+
+def make_update(data, file_id="FILE_ID"):
+    fetching_msg = SimpleNamespace(edit_text=AsyncMock(), delete=AsyncMock())
+    message = SimpleNamespace(
+        reply_text=AsyncMock(return_value=fetching_msg),
+        reply_audio=AsyncMock(
+            return_value=SimpleNamespace(audio=SimpleNamespace(file_id=file_id))
+        ),
+    )
+    query = SimpleNamespace(
+        data=data,
+        answer=AsyncMock(),
+        from_user=SimpleNamespace(id=1),
+        message=message,
+    )
+    return SimpleNamespace(callback_query=query), fetching_msg
+
+
+def test_concurrent_downloads_share_one_job(handlers):
+    first, _ = make_update("download_song_track1_mp3-128")
+    second, second_fetching = make_update("download_song_track1_mp3-128")
+
+    async def run():
+        await asyncio.gather(
+            handlers.module.handle_callback(first, None),
+            handlers.module.handle_callback(second, None),
+        )
+
+    asyncio.run(run())
+    assert handlers.calls.transcode == 1
+    second.callback_query.message.reply_audio.assert_awaited_once_with(
+        audio="FILE_ID", caption="Song: Song - Artist 🎶"
+    )
+    second_fetching.delete.assert_awaited_once()
+    assert handlers.module._inflight_downloads == {}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "download_song_track1_opus",
+        # Buttons sent before transcoding profiles carried chat and message ids
+        "download_song_track1_123_456_320",
+    ],
+)
+def test_download_song_parses_callback_data(handlers, data):
+    update, fetching_msg = make_update(data)
+
+    asyncio.run(handlers.module.handle_callback(update, None))
+
+    profile_id = get_profile(data.rsplit("_", 1)[-1])["id"]
+    assert handlers.calls.transcode == 1
+    assert handlers.file_ids == {f"track1:{profile_id}": "FILE_ID"}
+    fetching_msg.delete.assert_awaited_once()
+
+
+def test_download_song_rejects_invalid_callback_data(handlers):
+    update, _ = make_update("download_song_track1_unknown")
+
+    asyncio.run(handlers.module.handle_callback(update, None))
+
+    assert handlers.calls.transcode == 0
+    update.callback_query.message.reply_text.assert_awaited_once()
+    update.callback_query.message.reply_audio.assert_not_awaited()
+
+
+def test_download_song_cache_hit_skips_spotdl(handlers):
+    handlers.file_ids["track1:mp3-320"] = "CACHED_ID"
+    update, fetching_msg = make_update("download_song_track1_mp3-320")
+
+    asyncio.run(handlers.module.handle_callback(update, None))
+
+    assert handlers.calls.search == 0
+    assert handlers.calls.transcode == 0
+    update.callback_query.message.reply_audio.assert_awaited_once_with(
+        audio="CACHED_ID", caption="Song: Song - Artist 🎶"
+    )
+    fetching_msg.delete.assert_awaited_once()
+
+
+def test_transcode_workers_from_env(monkeypatch):
+    monkeypatch.setenv("TRANSCODE_WORKERS", "3")
+    assert transcoder.get_transcode_workers() == 3
+    monkeypatch.setenv("TRANSCODE_WORKERS", "0")
+    assert transcoder.get_transcode_workers() == 1
+
+
+def test_transcode_workers_from_cpu_affinity(monkeypatch):
+    monkeypatch.delenv("TRANSCODE_WORKERS", raising=False)
+    monkeypatch.setattr(
+        transcoder.os, "sched_getaffinity", lambda pid: {0, 1}, raising=False
+    )
+    assert transcoder.get_transcode_workers() == 2
+
+
+def test_transcode_workers_without_affinity(monkeypatch):
+    monkeypatch.delenv("TRANSCODE_WORKERS", raising=False)
+    monkeypatch.delattr(transcoder.os, "sched_getaffinity", raising=False)
+    monkeypatch.setattr(transcoder.os, "cpu_count", lambda: 6)
+    assert transcoder.get_transcode_workers() == 6
+
+
+def test_transcode_releases_active_jobs_on_error(monkeypatch):
+    def failing_download_song(song, profile, download_dir):
+        raise RuntimeError("download failed")
+
+    monkeypatch.setattr(transcoder, "download_song", failing_download_song)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(transcoder.transcode(make_song(), get_profile("m4a"), "a"))
+    assert transcoder.get_active_jobs() == 0
+    assert transcoder._track_locks == {}
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import time
+from collections import deque
+import pytest
+
+jobs = pytest.importorskip("core.jobs")
+from database import db
+
+
+@pytest.fixture
+def quiet_bot(monkeypatch):
+    monkeypatch.setattr(jobs, "get_active_jobs", lambda: 0)
+    monkeypatch.setattr(jobs, "_update_times", deque())
+
+
+def test_skip_reason_when_quiet(quiet_bot):
+    assert jobs.get_skip_reason() is None
+
+
+def test_skip_reason_with_active_downloads(quiet_bot, monkeypatch):
+    monkeypatch.setattr(jobs, "get_active_jobs", lambda: 2)
+    assert jobs.get_skip_reason() == "2 downloads running"
+
+
+def test_skip_reason_with_update_rate(quiet_bot, monkeypatch):
+    monkeypatch.setattr(jobs, "MAINTENANCE_MAX_UPDATE_RATE", 2)
+    minutes = jobs.ACTIVITY_WINDOW / 60
+    for _ in range(int(2 * minutes)):
+        asyncio.run(jobs.record_activity(None, None))
+    # At the threshold, not above it
+    assert jobs.get_skip_reason() is None
+
+    asyncio.run(jobs.record_activity(None, None))
+    assert "updates per minute" in jobs.get_skip_reason()
+
+
+def test_update_rate_ignores_old_updates(quiet_bot):
+    jobs._update_times.extend([time.monotonic() - jobs.ACTIVITY_WINDOW - 1] * 100)
+    assert jobs.get_update_rate() == 0
+
+
+@pytest.fixture
+def download_dir(tmp_path, monkeypatch):
+    path = tmp_path / "downloads"
+    path.mkdir()
+    monkeypatch.setattr(jobs, "DOWNLOAD_DIR", str(path))
+    return path
+
+
+def test_clean_download_dir_removes_stale_entries(download_dir):
+    stale = download_dir / "track1_opus_abc"
+    (stale / "sub").mkdir(parents=True)
+    (stale / "sub" / "song.opus").write_bytes(b"audio")
+    stale_file = download_dir / "song.mp3"
+    stale_file.write_bytes(b"audio")
+    for path in (stale / "sub" / "song.opus", stale / "sub", stale, stale_file):
+        os.utime(path, (0, 0))
+    # Just created by a download that hasn't written anything yet
+    fresh = download_dir / "track2_mp3-128_def"
+    fresh.mkdir()
+
+    assert jobs.clean_download_dir() == 2
+    assert os.listdir(download_dir) == [fresh.name]
+
+
+def test_clean_download_dir_keeps_entries_with_fresh_files(download_dir):
+    entry = download_dir / "track1_opus_abc"
+    entry.mkdir()
+    (entry / "song.opus").write_bytes(b"audio")
+    os.utime(entry, (0, 0))
+
+    assert jobs.clean_download_dir() == 0
+    assert entry.exists()
+
+
+def test_clean_download_dir_tolerates_removed_entries(download_dir, monkeypatch):
+    (download_dir / "finished").mkdir()
+
+    def removed(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(jobs, "get_latest_mtime", removed)
+    assert jobs.clean_download_dir() == 0
+
+
+def test_clean_download_dir_without_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "DOWNLOAD_DIR", str(tmp_path / "missing"))
+    assert jobs.clean_download_dir() == 0
+
+
+def test_job_callback_records_runs(data_dir, quiet_bot):
+    callback = jobs.make_job_callback("sample", lambda: 3, heavy=True)
+    asyncio.run(callback(None))
+    asyncio.run(callback(None))
+
+    state = db.get_job_state("maintenance:sample")
+    assert state["runs"] == 2
+    assert state["failures"] == 0
+    assert state["skipped"] == 0
+    assert state["last_result"] == 3
+    assert state["last_error"] is None
+    assert state["last_duration"] >= 0
+
+
+def test_job_callback_records_failures(data_dir, quiet_bot):
+    def fail():
+        raise RuntimeError("boom")
+
+    asyncio.run(jobs.make_job_callback("sample", fail, heavy=False)(None))
+
+    state = db.get_job_state("maintenance:sample")
+    assert state["runs"] == 0
+    assert state["failures"] == 1
+    assert state["last_error"] == "boom"
+    assert "last_duration" in state
+
+
+def test_job_callback_skips_heavy_jobs_when_busy(data_dir, quiet_bot, monkeypatch):
+    monkeypatch.setattr(jobs, "get_active_jobs", lambda: 1)
+    calls = []
+
+    asyncio.run(jobs.make_job_callback("heavy", calls.append, heavy=True)(None))
+    asyncio.run(jobs.make_job_callback("light", lambda: 1, heavy=False)(None))
+
+    heavy = db.get_job_state("maintenance:heavy")
+    assert heavy["skipped"] == 1
+    assert heavy["runs"] == 0
+    assert heavy["last_skip_reason"] == "1 downloads running"
+    assert calls == []
+    assert db.get_job_state("maintenance:light")["runs"] == 1
+
+
+def test_warm_metadata_cache_refreshes_expiring_entries(monkeypatch):
+    now = time.time()
+    expiry = {
+        # Valid well beyond the refresh window
+        "track:fresh": now + jobs.CACHE_WARM_AHEAD + 600,
+        "recommendations:fresh": now + jobs.CACHE_WARM_AHEAD + 600,
+        # Expiring within the window, or already gone
+        "track:expiring": now + 10,
+        "recommendations:expiring": now + jobs.CACHE_WARM_AHEAD + 600,
+    }
+    refreshed = []
+
+    def refresh_track(track_id):
+        refreshed.append(("track", track_id))
+
+    def refresh_recommendations(track_id):
+        raise RuntimeError("recommendations unavailable")
+
+    monkeypatch.setattr(
+        jobs, "get_top_requested", lambda limit: ["fresh", "expiring", "missing"]
+    )
+    monkeypatch.setattr(jobs, "get_metadata_expiry", expiry.get)
+    monkeypatch.setattr(
+        jobs,
+        "CACHE_REFRESHERS",
+        {"track": refresh_track, "recommendations": refresh_recommendations},
+    )
+
+    result = jobs.warm_metadata_cache()
+
+    assert refreshed == [("track", "expiring"), ("track", "missing")]
+    assert result == {
+        "refreshed": {"track": 2, "recommendations": 0},
+        "failed": {"track": 0, "recommendations": 1},
+    }
@@ -0,0 +1,93 @@
+import pytest
+
+spotify = pytest.importorskip("services.spotify")
+
+TRACK_INFO = {"track_id": "track1", "title": "Song", "artist": "Artist"}
+RECOMMENDATIONS = [{"title": "Other", "artist": "Artist", "track_id": "track2"}]
+
+
+@pytest.fixture
+def api(monkeypatch):
+    calls = []
+    cache = {}
+
+    def fetch_track_info(track_id):
+        calls.append(("track", track_id))
+        return TRACK_INFO
+
+    def fetch_recommendations(track_id):
+        calls.append(("recommendations", track_id))
+        return RECOMMENDATIONS
+
+    monkeypatch.setattr(spotify, "fetch_track_info", fetch_track_info)
+    monkeypatch.setattr(spotify, "fetch_recommendations", fetch_recommendations)
+    monkeypatch.setattr(spotify, "get_metadata", cache.get)
+    monkeypatch.setattr(
+        spotify, "save_metadata", lambda key, data, ttl: cache.__setitem__(key, data)
+    )
+    return calls, cache
+
+
+def test_track_info_cache_hit_makes_no_api_call(api):
+    calls, cache = api
+    cache["track:track1"] = TRACK_INFO
+
+    assert spotify.get_track_info_cached("track1") == TRACK_INFO
+    assert calls == []
+
+
+def test_track_info_cache_miss_fetches_and_saves(api):
+    calls, cache = api
+
+    assert spotify.get_track_info_cached("track1") == TRACK_INFO
+    assert spotify.get_track_info_cached("track1") == TRACK_INFO
+    assert calls == [("track", "track1")]
+    assert cache["track:track1"] == TRACK_INFO
+
+
+def test_recommendations_cache_hit_makes_no_api_call(api):
+    calls, cache = api
+    cache["recommendations:track1"] = RECOMMENDATIONS
+
+    assert spotify.get_recommendations_cached("track1") == RECOMMENDATIONS
+    assert calls == []
+
+
+def test_recommendations_cache_miss_fetches_and_saves(api):
+    calls, cache = api
+
+    assert spotify.get_recommendations_cached("track1") == RECOMMENDATIONS
+    assert calls == [("recommendations", "track1")]
+    assert cache["recommendations:track1"] == RECOMMENDATIONS
+
+
+def test_refreshes_are_independent(api):
+    calls, cache = api
+
+    spotify.refresh_track_info("track1")
+    assert calls == [("track", "track1")]
+    assert "recommendations:track1" not in cache
+
+
+def test_process_spotify_link_counts_views(api, monkeypatch):
+    counted = []
+    monkeypatch.setattr(spotify, "increment_request_count", counted.append)
+
+    result = spotify.process_spotify_link(
+        "https://open.spotify.com/track/track1?si=abc", "en"
+    )
+
+    assert result == TRACK_INFO
+    assert counted == ["track1"]
+
+
+@pytest.mark.parametrize(
+    "link",
+    [
+        "https://open.spotify.com/track/track1",
+        "https://open.spotify.com/track/track1?si=abc",
+        "spotify:track:track1",
+    ],
+)
+def test_get_track_id(link):
+    assert spotify.get_track_id(link) == "track1"